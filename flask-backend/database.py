@@ -1,5 +1,10 @@
-from supabase import create_client, Client
+from supabase import create_client, acreate_client, Client, ClientOptions, AsyncClientOptions
+import httpx
 import os
+import asyncio
+import atexit
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,7 +15,80 @@ SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env file!")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# One pooled HTTP client for the whole process so queries reuse keep-alive connections
+# (HTTP/2 multiplexes concurrent queries over a single TLS connection)
+http_client = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_connections=5, max_keepalive_connections=5, keepalive_expiry=1800),
+    timeout=30,
+)
+atexit.register(http_client.close)
+
+supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=http_client))
+
+# Public eSCRIBE link to a document's PDF (the document ID is appended)
+URL_PREFIX = "https://pub-london.escribemeetings.com/FileStream.ashx?DocumentId="
+
+# Max rows per upsert request in saveMultipleSummaries
+UPSERT_CHUNK_SIZE = 500
+
+# Max IDs per IN query in getExistingDocumentIds
+EXISTS_CHUNK_SIZE = 200
+
+# Columns returned by the list queries (everything the dashboard renders; detail lookups use '*')
+SUMMARY_LIST_COLUMNS = 'id,document_id,meeting_title,meeting_date,summary,original_url,created_at'
+
+# Materialized view holding the last RECENT_VIEW_DAYS of summaries (created by the README setup SQL)
+RECENT_VIEW = 'mv_recent_summaries'
+RECENT_VIEW_DAYS = 30
+
+# PostgREST/Postgres error codes for a table or view that doesn't exist
+MISSING_RELATION_CODES = {'42P01', 'PGRST205'}
+
+# Set once RECENT_VIEW turns out not to exist, so later calls go straight to the table
+_recent_view_missing = False
+
+# Max upsert requests in flight in saveMultipleSummariesAsync (Supabase pool allows 15)
+MAX_CONCURRENT_WRITES = 8
+
+def buildSummaryRecord(summary_data):
+    """
+    Build the database row for a summary (no network call)
+    
+    Args:
+        summary_data: Dictionary with all required fields from summarizer
+    
+    Returns:
+        Dictionary matching the meeting_summaries table columns
+    """
+    document_id = summary_data['document_id']
+    
+    return {
+        'document_id': document_id,
+        'meeting_title': summary_data['meeting_title'],
+        'meeting_date': summary_data['meeting_date'],
+        'summary': summary_data['summary'],
+        'original_url': URL_PREFIX + str(document_id),
+    }
+
+def _buildWriteQuery(client, records, overwrite=False):
+    """
+    Build the batched write request for meeting_summaries (sync or async client)
+    
+    Args:
+        client: Supabase client to build the request on
+        records: List of rows from buildSummaryRecord
+        overwrite: Update rows that already exist; otherwise existing document_ids are
+            left untouched (ON CONFLICT DO NOTHING) and only new rows are written
+    
+    Returns:
+        Query builder, ready for execute()
+    """
+    return client.table('meeting_summaries').upsert(
+        records,
+        on_conflict='document_id',
+        ignore_duplicates=not overwrite
+    )
 
 def saveSummaryToDatabase(summary_data):
     """
@@ -24,13 +102,7 @@ def saveSummaryToDatabase(summary_data):
         Result from database insert
     """
     try:
-        db_record = {
-            'document_id': summary_data['document_id'],
-            'meeting_title': summary_data['meeting_title'],
-            'meeting_date': summary_data['meeting_date'],
-            'summary': summary_data['summary'],
-            'original_url': f"https://pub-london.escribemeetings.com/FileStream.ashx?DocumentId={summary_data['document_id']}",
-        }
+        db_record = buildSummaryRecord(summary_data)
         
         # Insert into database (upsert to avoid duplicates)
         result = supabase.table('meeting_summaries').upsert(
@@ -45,48 +117,176 @@ def saveSummaryToDatabase(summary_data):
         print(f"  ✗ Database error: {str(e)}")
         return None
 
-def saveMultipleSummaries(summaries):
+def _printSaveReport(messages, success_count, total):
+    """
+    Print the per-row results and the completion banner of a batch save in a single write
+    
+    Args:
+        messages: Per-row/per-chunk result lines collected during the save
+        success_count: Number of written records
+        total: Number of summaries in the batch
+    """
+    print('\n'.join(messages + [
+        "\n" + "="*70,
+        "Database Save Complete:",
+        f"  ✓ Successful: {success_count}/{total}",
+        "="*70 + "\n",
+    ]))
+
+def saveMultipleSummaries(summaries, chunk_size=UPSERT_CHUNK_SIZE, overwrite=False):
     """
     Save multiple summaries to database
+    Rows are sent in batched requests (one request per chunk) instead of one request per row
     
     Args:
         summaries: List of summary dictionaries from summarizer
+        chunk_size: Maximum number of rows per request
+        overwrite: Update summaries that already exist instead of skipping them
     
     Returns:
-        Number of successfully saved records
+        Set of the document IDs written, taken from the rows the upsert returns
+        (without overwrite, rows that already existed are skipped and not included)
     """
     print(f"\n{'='*70}")
     print(f"Saving {len(summaries)} summaries to Supabase...")
     print(f"{'='*70}\n")
     
-    success_count = 0
+    records = [buildSummaryRecord(summary) for summary in summaries]
+    stored_ids = set()
+    messages = []  # Emitted with the report in one write instead of one print per row
+    
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        
+        try:
+            result = _buildWriteQuery(supabase, chunk, overwrite).execute()
+            
+            stored_ids.update(row['document_id'] for row in result.data)
+            messages.extend(f"  ✓ Saved to database: {row['meeting_title']}" for row in result.data)
+                
+        except Exception as e:
+            messages.append(f"  ✗ Database error ({len(chunk)} records): {str(e)}")
+    
+    _printSaveReport(messages, len(stored_ids), len(summaries))
+    
+    return stored_ids
+
+@asynccontextmanager
+async def openAsyncDatabaseClient(max_connections=MAX_CONCURRENT_WRITES):
+    """
+    Async Supabase client over its own pooled (HTTP/2) httpx.AsyncClient
+    Open one per run and pass it to saveMultipleSummariesAsync; the connections are closed on exit
+    
+    Args:
+        max_connections: Maximum number of pooled connections
     
-    for summary in summaries:
-        result = saveSummaryToDatabase(summary)
-        if result:
-            success_count += 1
+    Yields:
+        AsyncClient for the block's duration
+    """
+    async with httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=30,
+    ) as async_http_client:
+        yield await acreate_client(
+            SUPABASE_URL, SUPABASE_KEY,
+            options=AsyncClientOptions(httpx_client=async_http_client)
+        )
+
+async def saveMultipleSummariesAsync(summaries, client=None, chunk_size=UPSERT_CHUNK_SIZE,
+                                     max_concurrency=MAX_CONCURRENT_WRITES, overwrite=False):
+    """
+    Save multiple summaries to database with concurrent batched requests
+    Uses the async Supabase client so chunks overlap instead of waiting on each other
+    
+    Args:
+        summaries: List of summary dictionaries from summarizer
+        client: AsyncClient from openAsyncDatabaseClient, reused across calls; if omitted,
+            one is opened and closed for this call
+        chunk_size: Maximum number of rows per request
+        max_concurrency: Maximum number of requests in flight
+        overwrite: Update summaries that already exist instead of skipping them
+    
+    Returns:
+        Set of the document IDs written, taken from the rows the upsert returns
+        (without overwrite, rows that already existed are skipped and not included)
+    """
+    if client is None:
+        async with openAsyncDatabaseClient(max_concurrency) as client:
+            return await saveMultipleSummariesAsync(summaries, client, chunk_size, max_concurrency, overwrite)
     
     print(f"\n{'='*70}")
-    print(f"Database Save Complete:")
-    print(f"  ✓ Successful: {success_count}/{len(summaries)}")
+    print(f"Saving {len(summaries)} summaries to Supabase...")
     print(f"{'='*70}\n")
     
-    return success_count
+    records = [buildSummaryRecord(summary) for summary in summaries]
+    chunks = [records[start:start + chunk_size] for start in range(0, len(records), chunk_size)]
+    
+    semaphore = asyncio.Semaphore(max_concurrency)
+    messages = []  # Emitted with the report in one write instead of one print per row
+    
+    async def upsertChunk(chunk):
+        async with semaphore:
+            try:
+                result = await _buildWriteQuery(client, chunk, overwrite).execute()
+                
+                messages.extend(f"  ✓ Saved to database: {row['meeting_title']}" for row in result.data)
+                return [row['document_id'] for row in result.data]
+                
+            except Exception as e:
+                messages.append(f"  ✗ Database error ({len(chunk)} records): {str(e)}")
+                return []
+    
+    saved_ids = await asyncio.gather(*[upsertChunk(chunk) for chunk in chunks])
+    stored_ids = {doc_id for chunk_ids in saved_ids for doc_id in chunk_ids}
+    
+    _printSaveReport(messages, len(stored_ids), len(summaries))
+    
+    return stored_ids
 
-def getAllSummaries(limit=None):
-    """Retrieve all summaries from database"""
-    try:
-        query = supabase.table('meeting_summaries').select('*').order('meeting_date', desc=True)
-        
-        if limit:
-            query = query.limit(limit)
-        
-        result = query.execute()
-        return result.data
-        
-    except Exception as e:
-        print(f"Error retrieving summaries: {str(e)}")
-        return []
+def _quoteFilterValue(value):
+    """Quote a value for a PostgREST or=(...) filter so commas/parentheses in it stay literal"""
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+def getAllSummaries(limit=None, columns=SUMMARY_LIST_COLUMNS, before=None):
+    """
+    Retrieve all summaries from database, newest meeting first
+    
+    Args:
+        limit: Maximum number of summaries (page size)
+        columns: Columns to return; pass '*' for whole rows
+        before: (meeting_date, document_id) of the last row of the previous page; returns the
+            rows that follow it (keyset pagination: no OFFSET, so every page costs the same)
+    
+    Returns:
+        List of summary rows
+    
+    Raises:
+        ValueError: If the meeting_date of `before` is not an ISO date
+        Exception: Database errors from the query
+    """
+    if before:
+        before_date, before_id = before
+        before_date = date.fromisoformat(str(before_date)).isoformat()
+    
+    # document_id breaks ties between meetings on the same date, so pages never overlap
+    query = supabase.table('meeting_summaries').select(columns).order(
+        'meeting_date', desc=True
+    ).order('document_id', desc=True)
+    
+    if before:
+        before_id = _quoteFilterValue(before_id)
+        query = query.or_(
+            f'meeting_date.lt.{before_date},and(meeting_date.eq.{before_date},document_id.lt.{before_id})'
+        )
+    
+    if limit:
+        query = query.limit(limit)
+    
+    # Database errors propagate, so the API answers 500 instead of caching an empty list
+    result = query.execute()
+    return result.data
 
 def getSummaryByDocumentId(document_id):
     """Get a specific summary by document ID"""
@@ -98,19 +298,42 @@ def getSummaryByDocumentId(document_id):
         print(f"Error retrieving summary: {str(e)}")
         return None
 
-def getRecentSummaries(days=30):
-    """Get summaries from the last N days"""
-    try:
-        result = supabase.table('meeting_summaries').select('*').gte(
-            'created_at', 
-            f'now() - interval \'{days} days\''
-        ).order('meeting_date', desc=True).execute()
-        
-        return result.data
-        
-    except Exception as e:
-        print(f"Error retrieving recent summaries: {str(e)}")
-        return []
+def getRecentSummaries(days=30, columns=SUMMARY_LIST_COLUMNS):
+    """
+    Get summaries from the last N days (only the given columns; pass '*' for whole rows)
+    Windows up to RECENT_VIEW_DAYS are read from the RECENT_VIEW materialized view;
+    longer windows, or a database without the view, query meeting_summaries
+    Raises the database error if meeting_summaries can't be queried
+    """
+    global _recent_view_missing
+    
+    use_view = days <= RECENT_VIEW_DAYS and not _recent_view_missing
+    tables = [RECENT_VIEW, 'meeting_summaries'] if use_view else ['meeting_summaries']
+    
+    # Literal timestamp bound (PostgREST does not evaluate SQL expressions in filter values)
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    
+    for table in tables:
+        try:
+            # The view is only as fresh as its last refresh, so the window is still applied
+            result = supabase.table(table).select(columns).gte(
+                'created_at', 
+                cutoff
+            ).order('meeting_date', desc=True).execute()
+            
+            return result.data
+            
+        except Exception as e:
+            # Database errors propagate, so the API answers 500 instead of caching an empty list
+            if table == tables[-1]:
+                raise
+            
+            if getattr(e, 'code', None) in MISSING_RELATION_CODES:
+                # The view is optional setup: skip it for the rest of this process
+                _recent_view_missing = True
+                print(f"⚠️  {RECENT_VIEW} not found, reading recent summaries from meeting_summaries")
+            else:
+                print(f"Error retrieving recent summaries from {table}: {str(e)}")
 
 def checkIfDocumentExists(document_id):
     """
@@ -123,21 +346,76 @@ def checkIfDocumentExists(document_id):
         Boolean - True if exists, False otherwise
     """
     try:
-        result = supabase.table('meeting_summaries').select('document_id').eq('document_id', document_id).execute()
-        return len(result.data) > 0
+        # HEAD request: only the count of matching rows comes back, no body
+        result = supabase.table('meeting_summaries').select(
+            'document_id', count='exact', head=True
+        ).eq('document_id', document_id).limit(1).execute()
+        
+        return (result.count or 0) > 0
     except Exception as e:
         print(f"Error checking document existence: {str(e)}")
         return False
 
-def testDatabaseConnection():
-    """Test if Supabase connection is working"""
+def getExistingDocumentIds(document_ids, chunk_size=EXISTS_CHUNK_SIZE):
+    """
+    Check which documents already exist in database with bulk IN queries
+    
+    Args:
+        document_ids: Iterable of document IDs to check
+        chunk_size: Maximum number of IDs per query (keeps request URLs short)
+        
+    Returns:
+        Set of the document IDs that are already stored
+    """
+    document_ids = list(document_ids)
+    existing = set()
+    
+    try:
+        for start in range(0, len(document_ids), chunk_size):
+            chunk = document_ids[start:start + chunk_size]
+            result = supabase.table('meeting_summaries').select('document_id').in_('document_id', chunk).execute()
+            existing.update(row['document_id'] for row in result.data)
+    except Exception as e:
+        print(f"Error checking existing documents: {str(e)}")
+    
+    return existing
+
+def refreshMaterializedViews():
+    """
+    Refresh the materialized views (RECENT_VIEW) on demand through the refresh_meeting_summary_views
+    database function from the README setup (pg_cron runs it on a schedule)
+    Only the service role may execute it: SUPABASE_KEY must be the service_role key, not the anon key
+    
+    Returns:
+        Boolean - True if the refresh ran
+    """
+    try:
+        supabase.rpc('refresh_meeting_summary_views').execute()
+        return True
+        
+    except Exception as e:
+        print(f"Error refreshing materialized views: {str(e)}")
+        return False
+
+def testDatabaseConnection(exact=False):
+    """
+    Test if Supabase connection is working
+    
+    Args:
+        exact: Report an exact row count (scans the table) instead of the planner estimate
+    
+    Returns:
+        Boolean - True if the table is reachable
+    """
     print("\n🧪 Testing Supabase connection...")
     
     try:
-        result = supabase.table('meeting_summaries').select('count', count='exact').execute()
+        # HEAD request: only the count comes back (Content-Range header), no rows
+        count = 'exact' if exact else 'planned'
+        result = supabase.table('meeting_summaries').select('document_id', count=count, head=True).limit(1).execute()
         
         print(f"✓ Connection successful!")
-        print(f"  Database has {result.count} records")
+        print(f"  Database has {'' if exact else '~'}{result.count} records{'' if exact else ' (estimated)'}")
         return True
         
     except Exception as e:
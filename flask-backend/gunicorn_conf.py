@@ -0,0 +1,15 @@
+import multiprocessing
+
+# Production server settings for the API:
+#   cd flask-backend && gunicorn -c gunicorn_conf.py server:app
+
+bind = '0.0.0.0:5000'
+
+# Process-level parallelism
+workers = multiprocessing.cpu_count() * 2 + 1
+
+# Greenlets per worker, so requests waiting on Supabase don't block each other
+worker_class = 'gevent'
+worker_connections = 1000
+
+timeout = 30
@@ -0,0 +1,182 @@
+import os
+import time
+import json
+import pickle
+import sqlite3
+import hashlib
+from contextlib import closing
+
+from .parsers.parser import prepareTextForLLM, LLM_MAX_CHARS
+
+# Local record of processed DocumentIds, so repeat runs skip remote existence checks
+CACHE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache.db')
+
+# Stay under SQLite's bound-parameter limit (999 on older builds)
+MAX_SQL_PARAMS = 900
+
+# Prepared LLM texts, keyed by a hash of the raw extracted text
+PREPARE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.prepare_cache')
+
+# Bump when prepareTextForLLM/cleanText output changes so old entries are ignored
+PREPARE_CACHE_VERSION = 1
+
+# How long a cached Gemini summary is reused (seconds)
+SUMMARY_CACHE_TTL = 7 * 24 * 3600
+
+# How long a processed DocumentId is trusted before Supabase is asked again (seconds)
+PROCESSED_TTL = 30 * 24 * 3600
+
+def _connect():
+    """Open the cache database, creating the table on first use"""
+    conn = sqlite3.connect(CACHE_DB_PATH)
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS processed ('
+        'doc_id TEXT PRIMARY KEY, processed_at INTEGER, summary_hash TEXT)'
+    )
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS summary_responses ('
+        'cache_key TEXT PRIMARY KEY, created_at INTEGER, response TEXT)'
+    )
+    return conn
+
+def getProcessedDocumentIds(document_ids, ttl=PROCESSED_TTL):
+    """
+    Check which documents are already recorded as processed in the local cache
+    Expired entries are left out, so rows deleted from Supabase are picked up again
+    
+    Args:
+        document_ids: Iterable of document IDs to check
+        ttl: Maximum age of a usable entry (seconds)
+    
+    Returns:
+        Set of the document IDs found in the cache
+    """
+    document_ids = list(document_ids)
+    processed = set()
+    cutoff = int(time.time()) - ttl
+    
+    try:
+        with closing(_connect()) as conn:
+            for start in range(0, len(document_ids), MAX_SQL_PARAMS):
+                chunk = document_ids[start:start + MAX_SQL_PARAMS]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f'SELECT doc_id FROM processed WHERE doc_id IN ({placeholders}) AND processed_at > ?',
+                    (*chunk, cutoff)
+                )
+                processed.update(row[0] for row in rows)
+    except sqlite3.Error as e:
+        print(f"  ⚠️  Local cache unavailable: {str(e)}")
+    
+    return processed
+
+def markDocumentsProcessed(document_ids, summaries=None):
+    """
+    Record documents as processed in the local cache
+    
+    Args:
+        document_ids: Iterable of document IDs known to be stored in the database
+        summaries: Optional summary dictionaries, used to store a hash of each summary
+    """
+    summary_hashes = {
+        summary['document_id']: hashlib.sha256(summary['summary'].encode('utf-8')).hexdigest()
+        for summary in summaries or []
+    }
+    now = int(time.time())
+    rows = [(doc_id, now, summary_hashes.get(doc_id)) for doc_id in document_ids]
+    
+    if not rows:
+        return
+    
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.executemany('INSERT OR REPLACE INTO processed VALUES (?, ?, ?)', rows)
+    except sqlite3.Error as e:
+        print(f"  ⚠️  Could not update local cache: {str(e)}")
+
+def getCachedSummary(cache_key, ttl=SUMMARY_CACHE_TTL):
+    """
+    Look up a stored Gemini summary response
+    
+    Args:
+        cache_key: Hash of the model, instructions and document text
+        ttl: Maximum age of a usable entry (seconds)
+    
+    Returns:
+        Dictionary with meeting_title, meeting_date, summary, or None on a miss
+    """
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute(
+                'SELECT response FROM summary_responses WHERE cache_key = ? AND created_at > ?',
+                (cache_key, int(time.time()) - ttl)
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"  ⚠️  Local cache unavailable: {str(e)}")
+        return None
+    
+    return json.loads(row[0]) if row else None
+
+def storeCachedSummary(cache_key, data):
+    """
+    Store a validated Gemini summary response
+    
+    Args:
+        cache_key: Hash of the model, instructions and document text
+        data: Dictionary with meeting_title, meeting_date, summary
+    """
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO summary_responses VALUES (?, ?, ?)',
+                (cache_key, int(time.time()), json.dumps(data))
+            )
+    except sqlite3.Error as e:
+        print(f"  ⚠️  Could not update local cache: {str(e)}")
+
+def cachedPrepare(parsed_document, max_chars=LLM_MAX_CHARS, cache_dir=PREPARE_CACHE_DIR):
+    """
+    prepareTextForLLM with an on-disk cache keyed by the document text
+    Repeat runs over the same text load the cleaned text instead of recomputing it
+    
+    Args:
+        parsed_document: Dictionary from parsePdfFromDocumentId
+        max_chars: Passed through to prepareTextForLLM
+        cache_dir: Folder holding one pickle per prepared text
+    
+    Returns:
+        Dictionary in the prepareTextForLLM format
+    """
+    fingerprint = hashlib.blake2b(
+        f"{PREPARE_CACHE_VERSION}:{max_chars}:{parsed_document['text']}".encode('utf-8'),
+        digest_size=16
+    ).hexdigest()
+    cache_path = os.path.join(cache_dir, f"{fingerprint}.pkl")
+    
+    try:
+        with open(cache_path, 'rb') as f:
+            text = pickle.load(f)
+        
+        return {
+            'document_id': parsed_document['document_id'],
+            'filename': parsed_document['filename'],
+            'text': text,
+            'metadata': parsed_document['metadata'],
+        }
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+    
+    llm_doc = prepareTextForLLM(parsed_document, max_chars=max_chars)
+    
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        
+        # Write then rename, so a concurrent worker never reads a partial file
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(llm_doc['text'], f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"  ⚠️  Could not cache prepared text: {str(e)}")
+    
+    return llm_doc
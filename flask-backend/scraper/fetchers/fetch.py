@@ -4,15 +4,114 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException, SessionNotCreatedException
 from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
-import time
+import os
+import json
+import threading
 import re
+import html
+import requests
 import urllib3
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from heapq import nlargest
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Common date patterns, compiled once, paired with their parsing format
+_DATE_PATTERNS = [
+    (re.compile(r'(\w+ \d{1,2}, \d{4})'), '%B %d, %Y'),  # January 15, 2024
+    (re.compile(r'(\d{1,2}/\d{1,2}/\d{4})'), '%m/%d/%Y'),  # 01/15/2024
+    (re.compile(r'(\d{4}-\d{2}-\d{2})'), '%Y-%m-%d'),  # 2024-01-15
+]
+
+_DOCUMENT_ID_PATTERN = re.compile(r'DocumentId=(\d+)')
+
+# Single-pass scan of the page HTML: meeting title links, meeting-date divs and PDF links, in document order
+_PAGE_TOKEN_PATTERN = re.compile(
+    r'<a\b[^>]*href=["\'][^"\']*Meeting\.aspx[^"\']*["\'][^>]*>(?P<title>(?:(?!<a\b)[\s\S])*?)</a>'
+    r'|<div\b[^>]*class=["\']meeting-date["\'][^>]*>(?P<date>[^<]*)'
+    r'|<a\b[^>]*href=["\'][^"\']*FileStream\.ashx\?[^"\']*DocumentId=(?P<doc_id>\d+)[^>]*>(?P<link_text>[^<]{0,400})',
+    re.IGNORECASE
+)
+
+# Collapsible section toggles (the elements expandAllMeetings clicks); their documents only load on expand
+_COLLAPSED_SECTION_PATTERN = re.compile(
+    r'<(?:a|button|span|div)\b[^>]*'
+    r'(?:class=["\'][^"\']*\b(?:expand|expandable|collapsed|toggle)\b[^"\']*["\']|onclick=["\'][^"\']*expand)',
+    re.IGNORECASE
+)
+
+# Markup inside a captured title link (e.g. <span>), stripped to leave its text
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Clicks every visible element matched by the XPath selectors (each element once), returns the count
+_EXPAND_SCRIPT = """
+var clicked = new Set();
+arguments[0].forEach(function(selector) {
+    var result = document.evaluate(selector, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var i = 0; i < result.snapshotLength; i++) {
+        var element = result.snapshotItem(i);
+        if (clicked.has(element) || element.offsetParent === null) continue;
+        try { element.click(); clicked.add(element); } catch (e) {}
+    }
+});
+return clicked.size;
+"""
+
+_DOCUMENT_LINK_COUNT_SCRIPT = "return document.querySelectorAll('a[href*=\"FileStream.ashx\"]').length"
+
+# ChromeDriver path, resolved once per process and persisted across runs
+_DRIVER_PATH_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'cityscope', 'driver_path.json')
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+# Plain HTTP session for pages that don't need a browser to render
+_http_session = requests.Session()
+_http_session.headers.update({'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) CityScope/1.0'})
+
+def getChromeDriverPath(refresh=False):
+    """
+    Resolve the ChromeDriver binary path once and reuse it
+    Checks the in-process value, then the on-disk cache, then asks webdriver_manager
+    
+    Args:
+        refresh: Ignore cached paths and resolve the driver again
+    
+    Returns:
+        Path to the ChromeDriver binary
+    """
+    global _driver_path
+    
+    with _driver_path_lock:
+        if not refresh:
+            if _driver_path and os.path.exists(_driver_path):
+                return _driver_path
+            
+            try:
+                with open(_DRIVER_PATH_CACHE) as f:
+                    cached_path = json.load(f).get('path')
+                if cached_path and os.path.exists(cached_path):
+                    _driver_path = cached_path
+                    return _driver_path
+            except (OSError, ValueError):
+                pass
+        
+        _driver_path = ChromeDriverManager().install()
+        
+        try:
+            os.makedirs(os.path.dirname(_DRIVER_PATH_CACHE), exist_ok=True)
+            with open(_DRIVER_PATH_CACHE, 'w') as f:
+                json.dump({'path': _driver_path}, f)
+        except OSError:
+            pass
+        
+        return _driver_path
+
 def setupDriver(headless=True):
     """Setup Chrome WebDriver with appropriate options"""
     chrome_options = Options()
@@ -26,13 +125,37 @@ def setupDriver(headless=True):
     chrome_options.add_argument('--window-size=1920,1080')
     chrome_options.add_argument('--ignore-certificate-errors')
     
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
+    try:
+        driver = webdriver.Chrome(service=Service(getChromeDriverPath()), options=chrome_options)
+    except SessionNotCreatedException:
+        # Cached driver no longer matches the installed Chrome, resolve it again
+        driver = webdriver.Chrome(service=Service(getChromeDriverPath(refresh=True)), options=chrome_options)
     
     return driver
 
+def waitForStableValue(driver, script, timeout=5, poll_frequency=0.5):
+    """
+    Wait until a JavaScript expression returns the same value on two consecutive polls
+    Returns the last value seen (also on timeout)
+    """
+    last_value = [None]
+    
+    def settled(d):
+        current = d.execute_script(script)
+        if current == last_value[0]:
+            return True
+        last_value[0] = current
+        return False
+    
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(settled)
+    except TimeoutException:
+        pass
+    
+    return last_value[0]
+
 def expandAllMeetings(driver):
-    """Find and click all expand/collapse buttons"""
+    """Find and click all expand/collapse buttons in one browser-side script"""
     print("\nExpanding all meeting sections...")
     
     expand_selectors = [
@@ -45,66 +168,168 @@ def expandAllMeetings(driver):
         "//span[contains(@class, 'toggle')]",
     ]
     
-    expanded_count = 0
-    
-    for selector in expand_selectors:
-        try:
-            elements = driver.find_elements(By.XPATH, selector)
-            
-            for element in elements:
-                try:
-                    if element.is_displayed():
-                        driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                        time.sleep(0.3)
-                        element.click()
-                        expanded_count += 1
-                        time.sleep(0.5)
-                except Exception as e:
-                    pass
-        except Exception as e:
-            pass
+    try:
+        expanded_count = driver.execute_script(_EXPAND_SCRIPT, expand_selectors)
+    except Exception as e:
+        print(f"  ✗ Expand script failed: {str(e)}")
+        expanded_count = 0
     
     print(f"  ✓ Expanded {expanded_count} sections")
-    time.sleep(2)
+    
+    # One wait for the expanded sections to finish loading their document links
+    waitForStableValue(driver, _DOCUMENT_LINK_COUNT_SCRIPT)
 
+@lru_cache(maxsize=4096)
 def extractDateFromText(text):
     """
     Try to extract a date from text
     Returns datetime object or None
+    Cached because many links share the same parent container text
     """
-    # Common date patterns
-    patterns = [
-        r'(\w+ \d{1,2}, \d{4})',  # January 15, 2024
-        r'(\d{1,2}/\d{1,2}/\d{4})',  # 01/15/2024
-        r'(\d{4}-\d{2}-\d{2})',  # 2024-01-15
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text)
+    for pattern, fmt in _DATE_PATTERNS:
+        match = pattern.search(text)
         if match:
             try:
-                date_str = match.group(1)
-                # Try different parsing formats
-                for fmt in ['%B %d, %Y', '%m/%d/%Y', '%Y-%m-%d']:
-                    try:
-                        return datetime.strptime(date_str, fmt)
-                    except:
-                        continue
-            except:
+                return datetime.strptime(match.group(1), fmt)
+            except ValueError:
                 continue
     
     return None
 
-def extractDocumentsWithMetadata(url="https://pub-london.escribemeetings.com/", expand=True):
+def extractDocumentsFromHtml(page_source):
+    """
+    Extract DocumentIds with meeting metadata in a single regex scan of the page HTML
+    Meeting title links and meeting-date divs set the context for the document links after them
+    Returns list of dictionaries with document info
+    """
+    documents = []
+    meeting_title = None
+    meeting_date = None
+    
+    for match in _PAGE_TOKEN_PATTERN.finditer(page_source):
+        if match.group('title') is not None:
+            # A new meeting starts: nothing carries over from the previous one
+            meeting_title = html.unescape(_TAG_PATTERN.sub('', match.group('title'))).strip() or None
+            meeting_date = None
+            continue
+        
+        if match.group('date') is not None:
+            meeting_date = extractDateFromText(match.group('date').strip()) or meeting_date
+            continue
+        
+        doc_id = match.group('doc_id')
+        link_text = html.unescape(match.group('link_text')).strip()
+        
+        documents.append({
+            'document_id': doc_id,
+            'meeting_title': meeting_title or link_text or f"Meeting Document {doc_id}",
+            'meeting_date': meeting_date or extractDateFromText(link_text),
+        })
+    
+    return documents
+
+def extractDocumentsWithSoup(page_source):
+    """
+    Extract DocumentIds with meeting metadata by walking the parsed DOM
+    Slower fallback for markup the single-pass regex doesn't recognize
+    Returns list of dictionaries with document info
+    """
+    soup = BeautifulSoup(page_source, 'lxml')
+    documents = []
+    
+    # Find all PDF links
+    for link in soup.find_all('a', href=True):
+        href = link.get('href', '')
+        
+        if 'FileStream.ashx' in href and 'DocumentId=' in href:
+            match = _DOCUMENT_ID_PATTERN.search(href)
+            if match:
+                doc_id = match.group(1)
+                
+                # Try to find the meeting title (link with Meeting.aspx)
+                meeting_title = None
+                meeting_date = None
+                
+                # Look for parent container
+                parent_container = link.find_parent('div', class_=re.compile('meeting|item'))
+                if not parent_container:
+                    parent_container = link.find_parent('tr')  # Could be in a table row
+                if not parent_container:
+                    # Fallback: get any parent div
+                    parent_container = link.find_parent('div')
+                
+                if parent_container:
+                    # Extract meeting title from Meeting.aspx link
+                    title_link = parent_container.find('a', href=re.compile(r'Meeting\.aspx'))
+                    if title_link:
+                        meeting_title = title_link.get_text(strip=True)
+                    
+                    # Extract date from meeting-date div
+                    date_div = parent_container.find('div', class_='meeting-date')
+                    if date_div:
+                        date_text = date_div.get_text(strip=True)
+                        meeting_date = extractDateFromText(date_text)
+                    
+                    # Fallback: search for any date in the parent container
+                    if not meeting_date:
+                        container_text = parent_container.get_text()
+                        meeting_date = extractDateFromText(container_text)
+                
+                # Fallback: if no title found, use link text or filename
+                if not meeting_title:
+                    meeting_title = link.get_text(strip=True) or f"Meeting Document {doc_id}"
+                
+                documents.append({
+                    'document_id': doc_id,
+                    'meeting_title': meeting_title,
+                    'meeting_date': meeting_date,
+                })
+    
+    # Free the parse tree now rather than when the caller's frame unwinds
+    soup.decompose()
+    
+    return documents
+
+def extractDocumentsWithHttp(url):
+    """
+    Fetch the page HTML with a plain HTTP request and extract DocumentIds from it
+    Skips the browser launch, expand clicks and scroll waits entirely
+    The static HTML is only trusted when it has no collapsed sections: documents under
+    a collapsed section load on expand, so the list would silently be partial
+    Returns list of dictionaries with document info (empty if the page needs the browser)
+    """
+    print(f"Fetching page over HTTP: {url}")
+    
+    try:
+        response = _http_session.get(url, verify=False, timeout=30)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"  ✗ HTTP fetch failed: {str(e)}")
+        return []
+    
+    collapsed_count = len(_COLLAPSED_SECTION_PATTERN.findall(response.text))
+    if collapsed_count:
+        print(f"  ⚠️  {collapsed_count} collapsed sections in static HTML, documents need the browser")
+        return []
+    
+    documents = extractDocumentsFromHtml(response.text)
+    print(f"  ✓ Extracted {len(documents)} documents over HTTP")
+    
+    return documents
+
+def extractDocumentsWithMetadata(url="https://pub-london.escribemeetings.com/", expand=True, driver=None):
     """
     Scrape DocumentIds along with meeting metadata (date, title)
+    Pass an existing driver to reuse its browser; otherwise one is launched and closed here
     Returns list of dictionaries with document info
     """
     print(f"{'='*60}")
-    print(f"Launching browser to scrape: {url}")
+    print(f"Scraping with browser: {url}")
     print(f"{'='*60}\n")
     
-    driver = setupDriver(headless=True)
+    owns_driver = driver is None
+    if owns_driver:
+        driver = setupDriver(headless=True)
     documents = []
     
     try:
@@ -127,14 +352,16 @@ def extractDocumentsWithMetadata(url="https://pub-london.escribemeetings.com/",
         
         while scroll_attempts < max_scrolls:
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-            
-            new_height = driver.execute_script("return document.body.scrollHeight")
             
-            if new_height == last_height:
+            # Continue as soon as more content loads; stop once nothing new appears within the timeout
+            try:
+                WebDriverWait(driver, 2, poll_frequency=0.2).until(
+                    lambda d: d.execute_script("return document.body.scrollHeight") != last_height
+                )
+            except TimeoutException:
                 break
             
-            last_height = new_height
+            last_height = driver.execute_script("return document.body.scrollHeight")
             scroll_attempts += 1
             print(f"  Scroll {scroll_attempts}/{max_scrolls}")
         
@@ -142,63 +369,21 @@ def extractDocumentsWithMetadata(url="https://pub-london.escribemeetings.com/",
         
         # Get the fully loaded page source
         page_source = driver.page_source
-        soup = BeautifulSoup(page_source, 'html.parser')
         
         # Extract all PDFs with metadata
         print("\nExtracting documents with metadata...")
         
-        # Find all PDF links
-        for link in soup.find_all('a', href=True):
-            href = link.get('href', '')
-            
-            if 'FileStream.ashx' in href and 'DocumentId=' in href:
-                match = re.search(r'DocumentId=(\d+)', href)
-                if match:
-                    doc_id = match.group(1)
-                    
-                    # Try to find the meeting title (link with Meeting.aspx)
-                    meeting_title = None
-                    meeting_date = None
-                    
-                    # Look for parent container
-                    parent_container = link.find_parent('div', class_=re.compile('meeting|item'))
-                    if not parent_container:
-                        parent_container = link.find_parent('tr')  # Could be in a table row
-                    if not parent_container:
-                        # Fallback: get any parent div
-                        parent_container = link.find_parent('div')
-                    
-                    if parent_container:
-                        # Extract meeting title from Meeting.aspx link
-                        title_link = parent_container.find('a', href=re.compile('Meeting\.aspx'))
-                        if title_link:
-                            meeting_title = title_link.get_text(strip=True)
-                        
-                        # Extract date from meeting-date div
-                        date_div = parent_container.find('div', class_='meeting-date')
-                        if date_div:
-                            date_text = date_div.get_text(strip=True)
-                            meeting_date = extractDateFromText(date_text)
-                        
-                        # Fallback: search for any date in the parent container
-                        if not meeting_date:
-                            container_text = parent_container.get_text()
-                            meeting_date = extractDateFromText(container_text)
-                    
-                    # Fallback: if no title found, use link text or filename
-                    if not meeting_title:
-                        meeting_title = link.get_text(strip=True) or f"Meeting Document {doc_id}"
-                    
-                    doc_info = {
-                        'document_id': doc_id,
-                        'meeting_title': meeting_title,
-                        'meeting_date': meeting_date,
-                    }
-                    
-                    documents.append(doc_info)
-                    
-                    date_str = meeting_date.strftime('%Y-%m-%d') if meeting_date else 'No date'
-                    print(f"  Found: DocumentId={doc_id} | Date: {date_str} | {meeting_title[:60]}")
+        documents = extractDocumentsFromHtml(page_source)
+        if not documents:
+            # Markup didn't match the fast path, walk the DOM instead
+            documents = extractDocumentsWithSoup(page_source)
+        
+        # The multi-MB HTML isn't needed once documents are extracted
+        del page_source
+        
+        for doc in documents:
+            date_str = doc['meeting_date'].strftime('%Y-%m-%d') if doc['meeting_date'] else 'No date'
+            print(f"  Found: DocumentId={doc['document_id']} | Date: {date_str} | {doc['meeting_title'][:60]}")
         
         print(f"\n✓ Extracted {len(documents)} documents with metadata")
         
@@ -206,8 +391,9 @@ def extractDocumentsWithMetadata(url="https://pub-london.escribemeetings.com/",
         print(f"✗ Error during scraping: {str(e)}")
     
     finally:
-        driver.quit()
-        print("Browser closed")
+        if owns_driver:
+            driver.quit()
+            print("Browser closed")
     
     return documents
 
@@ -226,17 +412,12 @@ def getRecentDocuments(documents, limit=30):
     with_dates = [doc for doc in documents if doc['meeting_date'] is not None]
     without_dates = [doc for doc in documents if doc['meeting_date'] is None]
     
-    # Sort by date (most recent first)
-    with_dates_sorted = sorted(with_dates, key=lambda x: x['meeting_date'], reverse=True)
-    
-    # For documents without dates, sort by DocumentId (higher = more recent)
-    without_dates_sorted = sorted(without_dates, key=lambda x: int(x['document_id']), reverse=True)
+    # Take the most recent N documents without sorting the whole list:
+    # dated documents first (most recent date), then undated (higher DocumentId = more recent)
+    recent = nlargest(limit, with_dates, key=itemgetter('meeting_date'))
     
-    # Combine: dated documents first, then undated
-    all_sorted = with_dates_sorted + without_dates_sorted
-    
-    # Take the most recent N documents
-    recent = all_sorted[:limit]
+    if len(recent) < limit:
+        recent += nlargest(limit - len(recent), without_dates, key=lambda x: int(x['document_id']))
     
     print(f"\n📋 Selected {len(recent)} most recent documents:")
     for doc in recent[:5]:  # Show first 5
@@ -248,24 +429,51 @@ def getRecentDocuments(documents, limit=30):
     
     return recent
 
-def scrapeMultiplePages():
-    """Scrape multiple pages and return recent documents"""
+def scrapeMultiplePages(max_workers=4, use_browser=False):
+    """
+    Scrape multiple pages and return recent documents
+    Pages are fetched over plain HTTP concurrently; pages that need JavaScript
+    are then rendered one after another in a single shared browser
+    
+    Args:
+        max_workers: Maximum number of pages fetched over HTTP at once
+        use_browser: Always render pages with Selenium instead of trying plain HTTP first
+    """
     pages = [
         "https://pub-london.escribemeetings.com/",
         "https://pub-london.escribemeetings.com/?View=List",
     ]
     
-    all_documents = []
+    results = {}
+    
+    if not use_browser:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pages))) as executor:
+            results = dict(zip(pages, executor.map(extractDocumentsWithHttp, pages)))
     
+    browser_pages = [page_url for page_url in pages if not results.get(page_url)]
+    
+    if browser_pages:
+        if not use_browser:
+            print(f"  Static HTML empty or incomplete for {len(browser_pages)} page(s), falling back to browser")
+        
+        # One browser for all pages: startup cost is paid once
+        driver = setupDriver(headless=True)
+        try:
+            for page_url in browser_pages:
+                results[page_url] = extractDocumentsWithMetadata(page_url, expand=True, driver=driver)
+        finally:
+            driver.quit()
+            print("Browser closed")
+    
+    # Avoid duplicates: keyed by document_id, first occurrence wins (dicts keep page order)
+    unique_documents = {}
     for page_url in pages:
-        docs = extractDocumentsWithMetadata(page_url, expand=True)
-        # Avoid duplicates
-        existing_ids = {doc['document_id'] for doc in all_documents}
-        new_docs = [doc for doc in docs if doc['document_id'] not in existing_ids]
-        all_documents.extend(new_docs)
-        print(f"\nRunning total: {len(all_documents)} unique documents\n")
-    
-    return all_documents
+        for doc in results[page_url]:
+            unique_documents.setdefault(doc['document_id'], doc)
+    
+    print(f"\nRunning total: {len(unique_documents)} unique documents\n")
+    
+    return list(unique_documents.values())
 
 if __name__ == "__main__":
     # Scrape all documents with metadata
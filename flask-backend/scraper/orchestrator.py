@@ -1,14 +1,338 @@
-import sys
 import os
+import asyncio
+import multiprocessing
+from contextlib import nullcontext
+from heapq import nlargest
+from operator import itemgetter
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from .fetchers.fetch import scrapeMultiplePages
+from .parsers.parser import createAsyncPdfClient, fetchPdfAsync, parsePdfBytes
+from .cache import getProcessedDocumentIds, markDocumentsProcessed, cachedPrepare
 
-from fetchers.fetch import scrapeMultiplePages
-from parsers.parser import parseMultiplePdfs, prepareTextForLLM
-from summarizer import summarizeMultipleDocuments
-from database import saveMultipleSummaries, checkIfDocumentExists
+# Max documents waiting between two pipeline stages (bounds memory)
+STAGE_QUEUE_SIZE = 4
 
-def runCompletePipeline(max_documents=5, save_to_file=False, summarize=True, save_to_db=True, check_duplicates=True):
+# Summaries written to Supabase per batch while the pipeline is running
+SAVE_BATCH_SIZE = 10
+
+# PDFs downloaded and parsed concurrently
+PARSE_WORKERS = 4
+
+# Gemini requests in flight at once (call starts are still spaced by the rate limit)
+SUMMARIZE_CONCURRENCY = 4
+
+# Duplicate check starts with the newest max_documents x this many candidates
+CANDIDATE_WINDOW_FACTOR = 3
+
+# Output folders for --save
+EXTRACTED_TEXTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extracted_texts')
+SUMMARIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'summaries')
+
+# Files written concurrently by saveResultsToFiles
+FILE_WRITE_WORKERS = 8
+
+# Write buffer for --save output files (1MB instead of the default 8KB)
+FILE_WRITE_BUFFER = 1 << 20
+
+# Progress lines from runStreamingStages are printed in one write every this many finished steps
+LOG_FLUSH_INTERVAL = 5
+
+async def runStreamingStages(document_ids, summarize=True, save_to_db=True, overwrite=False,
+                             queue_size=STAGE_QUEUE_SIZE, save_batch_size=SAVE_BATCH_SIZE, requests_per_minute=None,
+                             parse_workers=PARSE_WORKERS, cached_ids=frozenset(), log_flush_interval=LOG_FLUSH_INTERVAL,
+                             summarize_concurrency=SUMMARIZE_CONCURRENCY):
+    """
+    Parse, summarize and save documents as a streaming pipeline
+    The stages run concurrently, connected by bounded queues: while one document
+    is being summarized the next PDFs are downloading/parsing and finished summaries are saved
+    
+    Args:
+        document_ids: DocumentIds to process, in order
+        summarize: Whether to generate AI summaries
+        save_to_db: Whether to save summaries to Supabase
+        overwrite: Update summaries that already exist in the database
+        queue_size: Maximum number of documents waiting between two stages
+        save_batch_size: Number of summaries written per database batch
+        requests_per_minute: Gemini rate limit to stay under (default: summarizer.REQUESTS_PER_MINUTE)
+        parse_workers: Number of PDFs downloaded at the same time (parsing uses one process per CPU)
+        cached_ids: DocumentIds to load from extracted_texts instead of fetching the PDF
+        log_flush_interval: Finished parse/summarize steps between buffered progress writes
+        summarize_concurrency: Maximum number of Gemini calls in flight
+    
+    Returns:
+        Dictionary with llm_ready_documents, failed_parse, summaries, failed_summaries, saved_ids
+        (lists in document_ids order)
+    """
+    # Imported only when needed: they create the Gemini/Supabase clients and require their API keys
+    if summarize:
+        from .summarizer import extractMetadataAndSummarizeAsync, lookupCachedSummary, createRateLimiter, REQUESTS_PER_MINUTE
+        waitForRateLimit = createRateLimiter(requests_per_minute or REQUESTS_PER_MINUTE)
+    if save_to_db:
+        from database import openAsyncDatabaseClient, saveMultipleSummariesAsync
+    
+    positions = {doc_id: idx for idx, doc_id in enumerate(document_ids)}
+    id_queue = asyncio.Queue()
+    for doc_id in document_ids:
+        id_queue.put_nowait(doc_id)
+    
+    parsed_queue = asyncio.Queue(maxsize=queue_size)
+    summary_queue = asyncio.Queue(maxsize=queue_size)
+    results = {
+        'llm_ready_documents': [],
+        'failed_parse': [],
+        'summaries': [],
+        'failed_summaries': [],
+        'saved_ids': set(),
+    }
+    
+    # Progress lines are buffered so the event loop isn't blocked on a terminal write per line
+    log_lines = []
+    finished_steps = 0
+    
+    def log(line):
+        log_lines.append(line)
+    
+    def flushLog():
+        if log_lines:
+            print('\n'.join(log_lines))
+            log_lines.clear()
+    
+    def stepFinished():
+        nonlocal finished_steps
+        finished_steps += 1
+        if finished_steps % log_flush_interval == 0:
+            flushLog()
+    
+    async def parseWorker():
+        while not id_queue.empty():
+            doc_id = id_queue.get_nowait()
+            log(f"[parse {positions[doc_id] + 1}/{len(document_ids)}] DocumentId={doc_id}")
+            
+            parsed = None
+            if doc_id in cached_ids:
+                parsed = await loop.run_in_executor(io_pool, loadDocumentFile, doc_id)
+                if parsed:
+                    log(f"  ✓ Loaded DocumentId={doc_id} from extracted_texts cache")
+            
+            if not parsed:
+                # Downloads share one pooled async client; parsing runs in a worker process
+                # (PyMuPDF isn't thread-safe, and threads would hold the GIL for the whole parse)
+                pdf_bytes, filename = await fetchPdfAsync(pdf_client, doc_id, log)
+                if pdf_bytes:
+                    # quiet: the outcome is reported through log() below instead of printed from the worker
+                    parsed = await loop.run_in_executor(cpu_pool, partial(parsePdfBytes, quiet=True), doc_id, pdf_bytes, filename)
+            if not parsed:
+                results['failed_parse'].append(doc_id)
+                log(f"  ✗ Failed to parse DocumentId={doc_id}")
+                stepFinished()
+                continue
+            
+            # CPU-bound text cleanup runs in a worker process, off the event loop (cached by text hash)
+            llm_doc = await loop.run_in_executor(cpu_pool, cachedPrepare, parsed)
+            results['llm_ready_documents'].append(llm_doc)
+            log(f"  ✓ {llm_doc['filename'][:50]} ({len(llm_doc['text'])} chars)")
+            stepFinished()
+            
+            await parsed_queue.put(llm_doc)
+    
+    async def parseStage():
+        await asyncio.gather(*[parseWorker() for _ in range(min(parse_workers, len(document_ids)))])
+        await parsed_queue.put(None)
+    
+    async def summarizeOne(doc):
+        try:
+            # Summaries cached by an earlier run (same text) need no API call, so they skip the rate limiter
+            result = await asyncio.to_thread(lookupCachedSummary, doc['text'], doc['filename'], doc['document_id'])
+            
+            if result:
+                log(f"[summarize] {doc['filename']} (cached)")
+            else:
+                await waitForRateLimit()
+                
+                log(f"[summarize] {doc['filename']}")
+                result = await extractMetadataAndSummarizeAsync(
+                    document_text=doc['text'],
+                    filename=doc['filename'],
+                    document_id=doc['document_id']
+                )
+        finally:
+            summarize_slots.release()
+        
+        if result:
+            results['summaries'].append(result)
+            log(f"  ✓ Title: {result['meeting_title'][:50]}")
+            log(f"  ✓ Date: {result['meeting_date']}")
+            stepFinished()
+            await summary_queue.put(result)
+        else:
+            results['failed_summaries'].append({
+                'document_id': doc['document_id'],
+                'filename': doc['filename'],
+                'error': 'Failed to extract title or date'
+            })
+            log(f"  ✗ Skipping document (no valid title/date)")
+            stepFinished()
+    
+    async def summarizeStage():
+        tasks = []
+        
+        while (doc := await parsed_queue.get()) is not None:
+            if not summarize:
+                continue
+            
+            # Take a slot before starting, so the stage stops pulling documents while all slots are busy
+            await summarize_slots.acquire()
+            tasks.append(asyncio.create_task(summarizeOne(doc)))
+        
+        await asyncio.gather(*tasks)
+        await summary_queue.put(None)
+    
+    async def saveStage():
+        batch = []
+        
+        while (summary := await summary_queue.get()) is not None:
+            if not save_to_db:
+                continue
+            
+            batch.append(summary)
+            if len(batch) >= save_batch_size:
+                flushLog()
+                results['saved_ids'] |= await saveMultipleSummariesAsync(batch, db_client, overwrite=overwrite)
+                batch = []
+        
+        if batch:
+            flushLog()
+            results['saved_ids'] |= await saveMultipleSummariesAsync(batch, db_client, overwrite=overwrite)
+    
+    loop = asyncio.get_running_loop()
+    summarize_slots = asyncio.Semaphore(summarize_concurrency)
+    
+    # One database client for the whole run: every save batch reuses its pooled connections
+    async with createAsyncPdfClient(max_connections=parse_workers) as pdf_client, \
+            (openAsyncDatabaseClient() if save_to_db else nullcontext()) as db_client:
+        # Parse/prepare workers are spawned, not forked: a fork would copy locks held by io_pool
+        # threads (stdout, file I/O) at that moment, and the child could deadlock on them
+        with ThreadPoolExecutor(max_workers=parse_workers) as io_pool, \
+                ProcessPoolExecutor(
+                    max_workers=max(1, min(os.cpu_count() or 1, len(document_ids))),
+                    mp_context=multiprocessing.get_context('spawn')
+                ) as cpu_pool:
+            await asyncio.gather(parseStage(), summarizeStage(), saveStage())
+    
+    flushLog()
+    
+    # Parse workers finish out of order; restore the input order for deterministic output
+    for key in ('llm_ready_documents', 'summaries', 'failed_summaries'):
+        results[key].sort(key=lambda doc: positions[doc['document_id']])
+    results['failed_parse'].sort(key=positions.get)
+    
+    return results
+
+def writeDocumentFile(doc, save_dir=EXTRACTED_TEXTS_DIR):
+    """Write one document's extracted text to save_dir/doc_<id>.txt"""
+    filename = os.path.join(save_dir, f"doc_{doc['document_id']}.txt")
+    # Encoded once and written as bytes, bypassing the text-mode wrapper
+    payload = ''.join([
+        f"DocumentId: {doc['document_id']}\n",
+        f"Filename: {doc['filename']}\n",
+        '='*70, '\n\n',
+        doc['text'],
+    ]).encode('utf-8')
+    
+    with open(filename, 'wb', buffering=FILE_WRITE_BUFFER) as f:
+        f.write(payload)
+    
+    return filename
+
+def getCachedDocumentIds(save_dir=EXTRACTED_TEXTS_DIR):
+    """DocumentIds whose extracted text is already on disk (one directory scan)"""
+    try:
+        with os.scandir(save_dir) as entries:
+            return {
+                entry.name[len('doc_'):-len('.txt')]
+                for entry in entries
+                if entry.name.startswith('doc_') and entry.name.endswith('.txt') and entry.is_file()
+            }
+    except FileNotFoundError:
+        return set()
+
+def loadDocumentFile(document_id, save_dir=EXTRACTED_TEXTS_DIR):
+    """
+    Load a file written by writeDocumentFile back into the parsed-document shape
+    Returns None if the file is missing or unreadable
+    """
+    filename = os.path.join(save_dir, f"doc_{document_id}.txt")
+    
+    try:
+        with open(filename, encoding='utf-8') as f:
+            header, _, text = f.read().partition("="*70 + "\n\n")
+    except OSError:
+        return None
+    
+    fields = dict(line.split(': ', 1) for line in header.splitlines() if ': ' in line)
+    
+    return {
+        'document_id': document_id,
+        'filename': fields.get('Filename', f"doc_{document_id}.pdf"),
+        'text': text,
+        'metadata': None,
+    }
+
+def writeSummaryFile(summary, save_dir=SUMMARIES_DIR):
+    """Write one summary to save_dir/summary_<id>.txt"""
+    filename = os.path.join(save_dir, f"summary_{summary['document_id']}.txt")
+    payload = ''.join([
+        f"DocumentId: {summary['document_id']}\n",
+        f"Filename: {summary['filename']}\n",
+        f"Compression: {summary['compression_ratio']}x\n",
+        '='*70, '\n\n',
+        summary['summary'],
+    ]).encode('utf-8')
+    
+    with open(filename, 'wb', buffering=FILE_WRITE_BUFFER) as f:
+        f.write(payload)
+    
+    return filename
+
+def saveResultsToFiles(llm_ready_documents, summaries, max_workers=FILE_WRITE_WORKERS):
+    """
+    Save extracted texts and summaries to local files
+    Files are written concurrently in a thread pool (file I/O releases the GIL)
+    
+    Returns:
+        Number of files written
+    """
+    os.makedirs(EXTRACTED_TEXTS_DIR, exist_ok=True)
+    os.makedirs(SUMMARIES_DIR, exist_ok=True)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        written = list(executor.map(writeDocumentFile, llm_ready_documents))
+        written += list(executor.map(writeSummaryFile, summaries))
+    
+    for filename in written:
+        print(f"  ✓ Saved {os.path.basename(os.path.dirname(filename))}/{os.path.basename(filename)}")
+    
+    return len(written)
+
+def lookupExistingDocumentIds(document_ids):
+    """
+    Find which documents are already stored, in one bulk query
+    The local cache is checked first; only IDs it hasn't seen are sent to Supabase
+    
+    Returns:
+        Set of the document IDs that already exist
+    """
+    from database import getExistingDocumentIds
+    
+    cached_ids = getProcessedDocumentIds(document_ids)
+    remote_ids = getExistingDocumentIds(doc_id for doc_id in document_ids if doc_id not in cached_ids)
+    markDocumentsProcessed(remote_ids)
+    
+    return cached_ids | remote_ids
+
+def runCompletePipeline(max_documents=5, save_to_file=False, summarize=True, save_to_db=True, check_duplicates=True, use_browser=False, refresh=False, return_text=False):
     """
     Complete pipeline with duplicate checking and batch processing
     
@@ -18,6 +342,10 @@ def runCompletePipeline(max_documents=5, save_to_file=False, summarize=True, sav
         summarize: Whether to generate AI summaries
         save_to_db: Whether to save summaries to Supabase
         check_duplicates: Whether to skip documents already in database
+        use_browser: Always scrape with Selenium instead of trying plain HTTP first
+        refresh: Re-fetch and re-parse PDFs even if their text is in extracted_texts
+        return_text: Keep the full 'text' of each returned document; otherwise it is
+            replaced by its 'char_count' so large strings aren't kept alive after the run
     
     Returns:
         Tuple of (llm_ready_documents, summaries)
@@ -30,17 +358,19 @@ def runCompletePipeline(max_documents=5, save_to_file=False, summarize=True, sav
     print("\n[STEP 1/6] Scraping DocumentIds from eSCRIBE portal...")
     print("-"*70)
     
-    all_documents = scrapeMultiplePages()
+    all_documents = scrapeMultiplePages(use_browser=use_browser)
 
     if not all_documents:
         print("\n✗ No documents found. Exiting.")
         return [], []
 
-    # Sort by document_id (higher = newer)
-    all_documents.sort(key=lambda x: int(x['document_id']), reverse=True)
-
     print(f"📋 Found {len(all_documents)} total documents")
     
+    # Convert each DocumentId once so ranking newest-first can use a C-level itemgetter key
+    for doc in all_documents:
+        doc['_id_int'] = int(doc['document_id'])
+    by_newest = itemgetter('_id_int')
+    
     # STEP 2: Filter out duplicates if requested
     documents_to_process = []
     skipped_count = 0
@@ -49,13 +379,31 @@ def runCompletePipeline(max_documents=5, save_to_file=False, summarize=True, sav
         print("\n[STEP 2/6] Checking for existing documents in database...")
         print("-"*70)
         
-        for doc in all_documents:
+        # Only the newest candidates are checked: start with a window of CANDIDATE_WINDOW_FACTOR x max_documents
+        # and widen it only if too many of them are already in the database
+        existing_ids = set()
+        checked_ids = set()
+        window = max_documents * CANDIDATE_WINDOW_FACTOR
+        
+        while True:
+            # Newest first (higher document_id = newer)
+            candidates = nlargest(window, all_documents, key=by_newest)
+            unchecked_ids = [doc['document_id'] for doc in candidates if doc['document_id'] not in checked_ids]
+            existing_ids |= lookupExistingDocumentIds(unchecked_ids)
+            checked_ids.update(unchecked_ids)
+            
+            new_count = sum(1 for doc in candidates if doc['document_id'] not in existing_ids)
+            if new_count >= max_documents or window >= len(all_documents):
+                break
+            window *= 2
+        
+        for doc in candidates:
             if len(documents_to_process) >= max_documents:
                 break
                 
             doc_id = doc['document_id']
             
-            if checkIfDocumentExists(doc_id):
+            if doc_id in existing_ids:
                 print(f"  ⊘ Skipping DocumentId={doc_id} (already in database)")
                 skipped_count += 1
             else:
@@ -65,7 +413,8 @@ def runCompletePipeline(max_documents=5, save_to_file=False, summarize=True, sav
         print(f"\n  New documents to process: {len(documents_to_process)}")
         print(f"  Duplicates skipped: {skipped_count}")
     else:
-        documents_to_process = all_documents[:max_documents]
+        # Newest first (higher document_id = newer)
+        documents_to_process = nlargest(max_documents, all_documents, key=by_newest)
     
     if not documents_to_process:
         print("\n✓ No new documents to process. Database is up to date!")
@@ -73,55 +422,56 @@ def runCompletePipeline(max_documents=5, save_to_file=False, summarize=True, sav
     
     document_ids = [doc['document_id'] for doc in documents_to_process]
     
-    # STEP 3: Parse PDFs and extract text
-    print(f"\n[STEP 3/6] Parsing {len(document_ids)} PDFs...")
+    # STEPS 3-6: Parse, prepare, summarize and save as one streaming pipeline
+    print(f"\n[STEP 3-6/6] Streaming {len(document_ids)} documents through parse → summarize → save...")
     print("-"*70)
     
-    parsed_documents, failed = parseMultiplePdfs(document_ids, max_docs=None)
+    # Without the duplicate check, documents may already exist and are re-summarized on purpose
+    results = asyncio.run(runStreamingStages(
+        document_ids,
+        summarize=summarize,
+        save_to_db=save_to_db,
+        overwrite=not check_duplicates,
+        cached_ids=set() if refresh else getCachedDocumentIds()
+    ))
+    
+    llm_ready_documents = results['llm_ready_documents']
+    summaries = results['summaries']
+    failed_summaries = results['failed_summaries']
     
-    if not parsed_documents:
+    if not llm_ready_documents:
         print("\n✗ No documents parsed successfully. Exiting.")
         return [], []
     
-    # STEP 4: Prepare for LLM
-    print("\n[STEP 4/6] Preparing documents for LLM processing...")
-    print("-"*70)
+    if failed_summaries:
+        print(f"\n⚠️  Skipped {len(failed_summaries)} documents (missing title/date)")
     
-    llm_ready_documents = []
-    for doc in parsed_documents:
-        llm_doc = prepareTextForLLM(doc)
-        llm_ready_documents.append(llm_doc)
-        print(f"  ✓ {llm_doc['filename'][:50]} ({len(llm_doc['text'])} chars)")
+    if save_to_file:
+        print("\nSaving extracted texts and summaries to files...")
+        saveResultsToFiles(llm_ready_documents, summaries)
     
-    # STEP 5: Extract metadata and generate summaries
-    summaries = []
-    if summarize and llm_ready_documents:
-        print("\n[STEP 5/6] Extracting metadata and generating summaries...")
-        print("-"*70)
-        
-        summaries, failed_summaries = summarizeMultipleDocuments(llm_ready_documents)
-        
-        if failed_summaries:
-            print(f"\n⚠️  Skipped {len(failed_summaries)} documents (missing title/date)")
-    
-    # STEP 6: Save to Supabase
     if save_to_db and summaries:
-        print("\n[STEP 6/6] Saving summaries to Supabase...")
-        print("-"*70)
+        print(f"  ✓ Saved {len(results['saved_ids'])} new summaries to database")
         
-        saved_count = saveMultipleSummaries(summaries)
-        print(f"  ✓ Saved {saved_count} new summaries to database")
+        # Only cache documents the upserts returned, i.e. confirmed to be in the database
+        markDocumentsProcessed(results['saved_ids'], summaries)
     
-    # Final Summary
-    print("\n" + "="*70)
-    print("PIPELINE COMPLETE")
-    print("="*70)
-    print(f"  Documents found: {len(all_documents)}")
-    print(f"  Already in database: {skipped_count}")
-    print(f"  New documents processed: {len(parsed_documents)}")
-    print(f"  Summaries generated: {len(summaries)}")
-    print(f"  Failed/Skipped: {len(failed_summaries) if summarize else 0}")
-    print("="*70 + "\n")
+    # Final Summary (one write to stdout)
+    print('\n'.join([
+        "\n" + "="*70,
+        "PIPELINE COMPLETE",
+        "="*70,
+        f"  Documents found: {len(all_documents)}",
+        f"  Already in database: {skipped_count}",
+        f"  New documents processed: {len(llm_ready_documents)}",
+        f"  Summaries generated: {len(summaries)}",
+        f"  Failed/Skipped: {len(failed_summaries)}",
+        "="*70 + "\n",
+    ]))
+    
+    if not return_text:
+        for doc in llm_ready_documents:
+            doc['char_count'] = len(doc.pop('text', ''))
     
     return llm_ready_documents, summaries
 
@@ -154,10 +504,14 @@ if __name__ == "__main__":
     parser.add_argument('--max', type=int, default=5, help='Maximum number of NEW documents to process (default: 5)')
     parser.add_argument('--save', action='store_true', help='Save extracted text to files')
     parser.add_argument('--no-check', action='store_true', help='Disable duplicate checking')
+    parser.add_argument('--no-summarize', action='store_true', help='Only scrape and parse (no Gemini calls, no database writes)')
+    parser.add_argument('--no-db', action='store_true', help='Do not check or write the database')
+    parser.add_argument('--browser', action='store_true', help='Always scrape with Selenium instead of plain HTTP first')
+    parser.add_argument('--refresh', action='store_true', help='Re-parse PDFs even if their text was saved with --save')
     
     args = parser.parse_args()
     
-    check_dups = not args.no_check
+    check_dups = not (args.no_check or args.no_db)
     
     if args.test:
         documents, summaries = quickTest()
@@ -165,7 +519,11 @@ if __name__ == "__main__":
         documents, summaries = runCompletePipeline(
             max_documents=args.max, 
             save_to_file=args.save,
-            check_duplicates=check_dups
+            check_duplicates=check_dups,
+            summarize=not args.no_summarize,
+            save_to_db=not (args.no_db or args.no_summarize),
+            use_browser=args.browser,
+            refresh=args.refresh
         )
     
     print("\n💡 Next steps:")
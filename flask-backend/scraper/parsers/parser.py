@@ -1,92 +1,182 @@
 import fitz  # PyMuPDF
 import requests
+import httpx
 import urllib3
-from io import BytesIO
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
+import os
+import multiprocessing
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-def fetchPdfFromUrl(document_id):
+# Pooled session for PDF downloads: keep-alive connections to the eSCRIBE host, retries on connection errors
+_pdf_session = requests.Session()
+_pdf_session.verify = False
+_pdf_session.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3),
+))
+
+# Worker processes for parseMultiplePdfs (PyMuPDF holds the GIL while parsing)
+PARSE_PROCESSES = min(os.cpu_count() or 1, 4)
+
+# Concurrent downloads in parseMultiplePdfs (I/O-bound, so threads)
+FETCH_THREADS = 8
+
+# Downloads parseMultiplePdfs may run ahead of parsing, bounding how many PDFs sit in memory
+PREFETCH_DEPTH = 8
+
+# All cleanText substitutions in one pass: runs of 3+ newlines, runs of 2+ spaces, page footers
+# (the footer allows repeated spaces, matching what it saw when spaces were collapsed first)
+_CLEAN_PATTERN = re.compile(r'(?P<newlines>\n{3,})|(?P<spaces> {2,})|(?P<footer>Page +\d+ +of +\d+)')
+_CLEAN_REPLACEMENTS = {'newlines': '\n\n', 'spaces': ' ', 'footer': ''}
+
+# Plain-text extraction flags: no image blocks, no span/char geometry beyond what "text" mode needs
+_TEXT_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Longest text sent to the LLM (~50k tokens at ~4 chars/token); longer documents keep their head and tail
+LLM_MAX_CHARS = 200_000
+
+# Share of LLM_MAX_CHARS taken from the start of a long document (title/date/agenda); the rest from its end
+LLM_HEAD_FRACTION = 0.8
+
+# Filename in a Content-Disposition header
+_FILENAME_PATTERN = re.compile(r'filename="?([^"]+)"?')
+
+def fetchPdfFromUrl(document_id, log=print):
     """
     Fetch a PDF directly into memory without saving to disk
-    Returns the PDF content as bytes
+    Progress goes to `log` as whole lines (pass a collecting logger when downloading from several threads)
+    Returns a tuple of (PDF content as bytes, filename), or (None, None) on failure
     """
     base_url = "https://pub-london.escribemeetings.com/FileStream.ashx?DocumentId="
     url = f"{base_url}{document_id}"
     
     try:
-        print(f"  Fetching DocumentId={document_id}...", end=' ')
-        response = requests.get(url, verify=False, timeout=60)
+        # Stream so an error page can be rejected from its headers before the body is downloaded
+        with _pdf_session.get(url, timeout=60, stream=True) as response:
+            if response.status_code != 200:
+                log(f"  Fetching DocumentId={document_id} ✗ Failed (Status: {response.status_code})")
+                return None, None
+            
+            if not isPdfContentType(response.headers):
+                log(f"  Fetching DocumentId={document_id} ✗ Not a PDF ({response.headers.get('content-type')})")
+                return None, None
+            
+            content = response.content
         
-        if response.status_code == 200:
-            file_size = len(response.content) / 1024  # KB
-            print(f"✓ ({file_size:.1f} KB)")
-            return response.content
-        else:
-            print(f"✗ Failed (Status: {response.status_code})")
-            return None
+        if not looksLikePdf(content):
+            log(f"  Fetching DocumentId={document_id} ✗ Not a PDF (missing %PDF- header)")
+            return None, None
+        
+        file_size = len(content) / 1024  # KB
+        log(f"  Fetched DocumentId={document_id} ✓ ({file_size:.1f} KB)")
+        return content, getFilenameFromHeaders(response.headers, document_id)
             
     except Exception as e:
-        print(f"✗ Error: {str(e)}")
-        return None
+        log(f"  Fetching DocumentId={document_id} ✗ Error: {str(e)}")
+        return None, None
 
-def extractTextFromPdfBytes(pdf_bytes):
+async def fetchPdfAsync(client, document_id, log=print):
     """
-    Extract text from PDF bytes (in-memory)
+    Fetch a PDF into memory over a shared httpx.AsyncClient
+    Many downloads can be in flight at once, reusing the client's pooled (HTTP/2) connections
+    Progress goes to `log` as whole lines (pass the caller's buffered logger when running concurrently)
+    Returns a tuple of (PDF content as bytes, filename), or (None, None) on failure
     """
+    base_url = "https://pub-london.escribemeetings.com/FileStream.ashx?DocumentId="
+    url = f"{base_url}{document_id}"
+    
     try:
-        # Open PDF from memory using BytesIO
-        pdf_stream = BytesIO(pdf_bytes)
-        doc = fitz.open(stream=pdf_stream, filetype="pdf")
-        
-        full_text = []
-        
-        # Extract text from each page
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
-            full_text.append(text)
-        
-        doc.close()
+        # Stream so an error page can be rejected from its headers before the body is downloaded
+        async with client.stream('GET', url) as response:
+            if response.status_code != 200:
+                log(f"  Fetching DocumentId={document_id} ✗ Failed (Status: {response.status_code})")
+                return None, None
+            
+            if not isPdfContentType(response.headers):
+                log(f"  Fetching DocumentId={document_id} ✗ Not a PDF ({response.headers.get('content-type')})")
+                return None, None
+            
+            content = await response.aread()
         
-        # Join all pages with double newline
-        return '\n\n'.join(full_text)
+        if not looksLikePdf(content):
+            log(f"  Fetching DocumentId={document_id} ✗ Not a PDF (missing %PDF- header)")
+            return None, None
         
+        file_size = len(content) / 1024  # KB
+        log(f"  Fetched DocumentId={document_id} ✓ ({file_size:.1f} KB)")
+        return content, getFilenameFromHeaders(response.headers, document_id)
+            
     except Exception as e:
-        print(f"    ✗ Error parsing PDF: {str(e)}")
-        return None
+        log(f"  Fetching DocumentId={document_id} ✗ Error: {str(e)}")
+        return None, None
 
-def extractMetadataFromPdfBytes(pdf_bytes):
+def isPdfContentType(headers):
     """
-    Extract metadata from PDF bytes (in-memory)
+    Check the Content-Type of a PDF response before downloading its body
+    Rejects text responses (HTML error pages); generic binary types are let through to looksLikePdf
+    """
+    content_type = headers.get('content-type', '').lower()
+    return not content_type.startswith('text/')
+
+def looksLikePdf(content):
+    """
+    Check for the %PDF- magic header (allowed anywhere in the first 1 KB by the PDF spec)
+    """
+    return bool(content) and b'%PDF-' in content[:1024]
+
+def createAsyncPdfClient(max_connections=10):
+    """
+    Create the shared async HTTP client used by fetchPdfAsync
+    The caller is responsible for closing it (async with)
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        verify=False,
+        timeout=60,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+
+def extractTextAndMetadata(pdf_bytes, quiet=False):
+    """
+    Extract text and metadata from PDF bytes (in-memory), opening the document once
+    Errors are printed unless quiet
+    Returns a tuple of (text, metadata), or (None, None) on failure
     """
     try:
-        pdf_stream = BytesIO(pdf_bytes)
-        doc = fitz.open(stream=pdf_stream, filetype="pdf")
+        # Open PDF straight from the downloaded bytes (no BytesIO copy)
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        
+        # Extract text from each page, joined with double newline as pages are read
+        text = '\n\n'.join(page.get_text('text', flags=_TEXT_FLAGS) for page in doc)
+        
         metadata = doc.metadata
         doc.close()
-        return metadata
+        
+        return text, metadata
+        
     except Exception as e:
-        print(f"    ✗ Error extracting metadata: {str(e)}")
-        return None
+        if not quiet:
+            print(f"    ✗ Error parsing PDF: {str(e)}")
+        return None, None
 
-def getFilenameFromResponse(document_id):
+def getFilenameFromHeaders(headers, document_id):
     """
-    Get the actual filename from the Content-Disposition header
+    Get the actual filename from the Content-Disposition header of the PDF response
     """
-    base_url = "https://pub-london.escribemeetings.com/FileStream.ashx?DocumentId="
-    url = f"{base_url}{document_id}"
+    content_disposition = headers.get('content-disposition', '')
     
-    try:
-        response = requests.head(url, verify=False, timeout=10)
-        content_disposition = response.headers.get('content-disposition', '')
-        
-        if 'filename=' in content_disposition:
-            filename_match = re.search(r'filename="?([^"]+)"?', content_disposition)
-            if filename_match:
-                return filename_match.group(1).strip().replace('"', '')
-    except:
-        pass
+    if 'filename=' in content_disposition:
+        filename_match = _FILENAME_PATTERN.search(content_disposition)
+        if filename_match:
+            return filename_match.group(1).strip().replace('"', '')
     
     return f"doc_{document_id}.pdf"
 
@@ -95,42 +185,77 @@ def parsePdfFromDocumentId(document_id):
     Complete pipeline: Fetch PDF and extract text
     Returns a dictionary with all extracted data
     """
-    # Fetch the PDF
-    pdf_bytes = fetchPdfFromUrl(document_id)
+    # Fetch the PDF (the filename comes from the same response)
+    pdf_bytes, filename = fetchPdfFromUrl(document_id)
     
+    if not pdf_bytes:
+        return None
+    
+    return parsePdfBytes(document_id, pdf_bytes, filename)
+
+def parsePdfBytes(document_id, pdf_bytes, filename=None, quiet=False):
+    """
+    Extract text and metadata from an already downloaded PDF (one fitz.open for both)
+    Pass quiet=True when several parses run at once (thread/process pools): the progress
+    line is printed in pieces and would interleave, so the caller reports the outcome instead
+    Returns a dictionary with all extracted data
+    """
     if not pdf_bytes:
         return None
     
     # Extract text
-    print(f"    Extracting text...", end=' ')
-    text = extractTextFromPdfBytes(pdf_bytes)
+    if not quiet:
+        print(f"    Extracting text...", end=' ')
+    text, metadata = extractTextAndMetadata(pdf_bytes, quiet)
     
     if not text:
-        print("✗ No text extracted")
+        if not quiet:
+            print("✗ No text extracted")
         return None
     
-    print(f"✓ ({len(text)} characters)")
-    
-    # Extract metadata
-    metadata = extractMetadataFromPdfBytes(pdf_bytes)
-    filename = getFilenameFromResponse(document_id)
+    if not quiet:
+        print(f"✓ ({len(text)} characters)")
     
     return {
         'document_id': document_id,
-        'filename': filename,
+        'filename': filename or f"doc_{document_id}.pdf",
         'text': text,
         'text_length': len(text),
         'metadata': metadata,
         'word_count': len(text.split()),
     }
 
-def parseMultiplePdfs(document_ids, max_docs=None):
+def fetchPdfWithLog(document_id):
+    """
+    fetchPdfFromUrl for a download thread: progress is collected instead of printed
+    Returns a tuple of (PDF content as bytes, filename, list of progress lines)
+    """
+    lines = []
+    content, filename = fetchPdfFromUrl(document_id, log=lines.append)
+    return content, filename, lines
+
+def prefetchPdfs(document_ids, fetcher, depth=PREFETCH_DEPTH):
+    """
+    Yield fetchPdfWithLog results in input order, keeping up to `depth` downloads in flight
+    The next download starts as each one is taken, so fetching overlaps whatever the consumer does
+    """
+    remaining = iter(document_ids)
+    pending = deque(fetcher.submit(fetchPdfWithLog, doc_id) for doc_id in islice(remaining, depth))
+    
+    while pending:
+        result = pending.popleft().result()
+        pending.extend(fetcher.submit(fetchPdfWithLog, doc_id) for doc_id in islice(remaining, 1))
+        yield result
+
+def parseMultiplePdfs(document_ids, max_docs=None, max_workers=PARSE_PROCESSES, fetch_workers=FETCH_THREADS,
+                      prefetch=PREFETCH_DEPTH):
     """
     Parse multiple PDFs from a list of DocumentIds
+    PDFs are downloaded in a thread pool and parsed in a process pool; results keep the input order
+    Downloads run at most `prefetch` documents ahead, and at most max_workers parses are queued
     Returns a list of parsed documents
     """
-    if max_docs:
-        document_ids = list(document_ids)[:max_docs]
+    document_ids = list(document_ids)[:max_docs] if max_docs else list(document_ids)
     
     parsed_documents = []
     failed_documents = []
@@ -139,17 +264,40 @@ def parseMultiplePdfs(document_ids, max_docs=None):
     print(f"Parsing {len(document_ids)} PDFs...")
     print(f"{'='*60}\n")
     
-    for idx, doc_id in enumerate(document_ids, 1):
-        print(f"[{idx}/{len(document_ids)}] DocumentId={doc_id}")
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetcher, \
+            ProcessPoolExecutor(
+                max_workers=max(1, min(max_workers, len(document_ids))),
+                mp_context=multiprocessing.get_context('spawn')  # no fork while fetch threads run
+            ) as executor:
+        # Each PDF is handed to a parse process as soon as its download finishes,
+        # while the following downloads are already in flight
+        downloads = zip(document_ids, prefetchPdfs(document_ids, fetcher, prefetch))
+        # Download progress travels with each parse so it is printed from this loop, never from the threads
+        futures = deque(
+            (fetch_log, executor.submit(parsePdfBytes, doc_id, pdf_bytes, filename, quiet=True))
+            for doc_id, (pdf_bytes, filename, fetch_log) in islice(downloads, max_workers)
+        )
         
-        result = parsePdfFromDocumentId(doc_id)
-        
-        if result:
-            parsed_documents.append(result)
-            print(f"    ✓ Complete: {result['word_count']} words extracted\n")
-        else:
-            failed_documents.append(doc_id)
-            print(f"    ✗ Failed to parse\n")
+        for idx, doc_id in enumerate(document_ids, 1):
+            fetch_log, future = futures.popleft()
+            result = future.result()
+            
+            # A parse process just freed up: hand it the next downloaded PDF
+            futures.extend(
+                (next_log, executor.submit(parsePdfBytes, next_id, pdf_bytes, filename, quiet=True))
+                for next_id, (pdf_bytes, filename, next_log) in islice(downloads, 1)
+            )
+            
+            print(f"[{idx}/{len(document_ids)}] DocumentId={doc_id}")
+            for line in fetch_log:
+                print(line)
+            
+            if result:
+                parsed_documents.append(result)
+                print(f"    ✓ Complete: {result['word_count']} words extracted\n")
+            else:
+                failed_documents.append(doc_id)
+                print(f"    ✗ Failed to parse\n")
     
     print(f"{'='*60}")
     print(f"Parsing Summary:")
@@ -169,26 +317,31 @@ def cleanText(text):
     if not text:
         return ""
     
-    # Remove multiple consecutive newlines
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    # Collapse newlines/spaces and drop header/footer patterns in a single scan
+    # (customize _CLEAN_PATTERN as needed)
+    text = _CLEAN_PATTERN.sub(lambda match: _CLEAN_REPLACEMENTS[match.lastgroup], text)
     
-    # Remove multiple spaces
-    text = re.sub(r' {2,}', ' ', text)
+    return text.strip()
+
+def truncateText(text, max_chars=LLM_MAX_CHARS, head_fraction=LLM_HEAD_FRACTION):
+    """
+    Bound text to max_chars by keeping its head and tail and eliding the middle
+    Returns the text unchanged if it already fits (or max_chars is None)
+    """
+    if not max_chars or len(text) <= max_chars:
+        return text
     
-    # Remove common header/footer patterns (customize as needed)
-    text = re.sub(r'Page \d+ of \d+', '', text)
+    head_chars = int(max_chars * head_fraction)
+    tail_chars = max_chars - head_chars
     
-    return text.strip()
+    return text[:head_chars] + "\n\n[...elided...]\n\n" + (text[-tail_chars:] if tail_chars else "")
 
-def prepareTextForLLM(parsed_document, max_chars=None):
+def prepareTextForLLM(parsed_document, max_chars=LLM_MAX_CHARS):
     """
     Prepare extracted text for LLM input
-    Optionally truncate if too long
+    Truncate (head + tail) if too long
     """
-    text = cleanText(parsed_document['text'])
-    
-    if max_chars and len(text) > max_chars:
-        text = text[:max_chars] + "\n\n[Document truncated...]"
+    text = truncateText(cleanText(parsed_document['text']), max_chars)
     
     return {
         'document_id': parsed_document['document_id'],
@@ -1,10 +1,16 @@
 from google import genai
+from google.genai import types
 import os
 from dotenv import load_dotenv
-import time
 import json
+import asyncio
+import hashlib
+from datetime import date
 
-load_dotenv(dotenv_path='../.env')
+from .cache import getCachedSummary, storeCachedSummary
+from .parsers.parser import truncateText
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
 
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
@@ -13,27 +19,26 @@ if not GEMINI_API_KEY:
 
 client = genai.Client(api_key=GEMINI_API_KEY)
 
-def extractMetadataAndSummarize(document_text, filename="", document_id=""):
-    """
-    Extract title, date, and create summary from document
-    
-    Returns:
-        Dictionary with title, date, summary, or None if extraction fails
-    """
-    
-    prompt = f"""You are analyzing City of London council meeting minutes.
+# Model used for every summarizer call (Flash: lowest time per output character)
+SUMMARY_MODEL = 'gemini-2.5-flash'
+
+# Gemini calls in flight at once in summarizeMultipleDocuments
+MAX_CONCURRENT_REQUESTS = 15
 
-TASK: Extract the meeting title, date, and create a concise summary.
+# Gemini request rate limit (free tier); call starts are spaced 60/REQUESTS_PER_MINUTE seconds apart
+REQUESTS_PER_MINUTE = 15
 
-DOCUMENT TEXT:
-{document_text}
+# Fixed instructions, sent once as a cached system instruction instead of inside every prompt
+SUMMARY_INSTRUCTIONS = """You are analyzing City of London council meeting minutes.
+
+TASK: Extract the meeting title, date, and create a concise summary of the document text you are given.
 
 RESPOND IN THIS EXACT JSON FORMAT (no markdown, no code blocks, just raw JSON):
-{{
+{
   "meeting_title": "Full meeting title from the document",
   "meeting_date": "YYYY-MM-DD format",
   "summary": "First sentence describing the meeting topic. Then bullet points of major actions taken."
-}}
+}
 
 RULES:
 1. meeting_title: Extract the EXACT official meeting title (e.g., "Planning and Environment Committee")
@@ -48,66 +53,259 @@ RULES:
 
 IMPORTANT: If you cannot find a clear meeting title or date, set them to null.
 
-Respond with ONLY the JSON, nothing else:"""
+Respond with ONLY the JSON, nothing else."""
+
+# Structured output schema: Gemini returns validated JSON instead of free text to clean up
+SUMMARY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'meeting_title': {'type': 'string', 'nullable': True},
+        'meeting_date': {'type': 'string', 'nullable': True},
+        'summary': {'type': 'string'},
+    },
+    'required': ['meeting_title', 'meeting_date', 'summary'],
+}
+
+# Static lead-in of every per-document prompt, kept byte-identical so requests share a cacheable prefix
+DOCUMENT_PROMPT_PREFIX = "DOCUMENT TEXT:\n"
+
+# Generation config shared by every summarizer call: the instructions go out as the system
+# instruction (an identical prefix on every request, which Gemini's implicit caching reuses;
+# they are too short for an explicit context cache) and the reply is constrained to SUMMARY_SCHEMA
+SUMMARY_CONFIG = types.GenerateContentConfig(
+    system_instruction=SUMMARY_INSTRUCTIONS,
+    response_mime_type='application/json',
+    response_schema=SUMMARY_SCHEMA
+)
+
+def buildSummaryPrompt(document_text):
+    """
+    Build the per-document part of the Gemini request (instructions come from SUMMARY_CONFIG)
+    Text is bounded to the LLM budget here too, for callers that pass unprepared text
+    """
+    return DOCUMENT_PROMPT_PREFIX + truncateText(document_text)
+
+def parseSummaryResponse(response, document_text, filename="", document_id="", prefix=""):
+    """
+    Validate Gemini's structured JSON reply
+    
+    Args:
+        response: GenerateContentResponse (parsed according to SUMMARY_SCHEMA)
+        document_text: Text that was summarized (for compression stats)
+        filename: Original filename
+        document_id: eSCRIBE DocumentId
+        prefix: Printed before each status message
+    
+    Returns:
+        Dictionary with title, date, summary, or None if extraction fails
+    """
+    data = response.parsed
+    
+    # The SDK leaves parsed empty if the reply didn't match the schema (e.g. truncated output)
+    if not isinstance(data, dict):
+        try:
+            data = json.loads(response.text or '')
+        except json.JSONDecodeError as e:
+            print(f"{prefix}✗ JSON Error: {str(e)}")
+            print(f"Response was: {(response.text or '')[:200]}")
+            return None
+    
+    # Validate required fields
+    if not data.get('meeting_title') or not data.get('meeting_date'):
+        print(f"{prefix}✗ Missing title or date")
+        return None
+    
+    # Validate date format (meeting_date is a NOT NULL DATE column, one bad value fails a whole batch)
+    if not isValidMeetingDate(data['meeting_date']):
+        print(f"{prefix}✗ Invalid date: {data['meeting_date']}")
+        return None
+    
+    print(f"{prefix}✓ ({len(data['summary'])} chars)")
+    
+    return buildSummaryResult(data, document_text, filename, document_id)
+
+def isValidMeetingDate(value):
+    """Check that a meeting date is an ISO YYYY-MM-DD string the database will accept"""
+    try:
+        date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+def buildSummaryResult(data, document_text, filename="", document_id=""):
+    """Build the summary dictionary returned to callers from validated response data"""
+    return {
+        'document_id': document_id,
+        'filename': filename,
+        'meeting_title': data['meeting_title'],
+        'meeting_date': data['meeting_date'],
+        'summary': data['summary'],
+        'original_length': len(document_text),
+        'summary_length': len(data['summary']),
+        'compression_ratio': round(len(document_text) / len(data['summary']), 1) if len(data['summary']) > 0 else 0
+    }
+
+def getSummaryCacheKey(document_text):
+    """Key for the local response cache (changes with the model, instructions or text)"""
+    return hashlib.sha256(
+        f"{SUMMARY_MODEL}\n{SUMMARY_INSTRUCTIONS}\n{document_text}".encode('utf-8')
+    ).hexdigest()
 
+def lookupCachedSummary(document_text, filename="", document_id=""):
+    """
+    Return the summary stored for this exact text by an earlier run, without calling Gemini
+    
+    Returns:
+        Dictionary with title, date, summary, or None on a cache miss
+    """
+    data = getCachedSummary(getSummaryCacheKey(document_text))
+    
+    # Entries written before dates were validated would fail the database write again every run
+    if not data or not isValidMeetingDate(data.get('meeting_date')):
+        return None
+    
+    return buildSummaryResult(data, document_text, filename, document_id)
+
+def rememberSummary(document_text, result):
+    """Store a successful result in the local response cache (only results with a valid date)"""
+    if not isValidMeetingDate(result.get('meeting_date')):
+        return
+    
+    storeCachedSummary(getSummaryCacheKey(document_text), {
+        'meeting_title': result['meeting_title'],
+        'meeting_date': result['meeting_date'],
+        'summary': result['summary'],
+    })
+
+def extractMetadataAndSummarize(document_text, filename="", document_id=""):
+    """
+    Extract title, date, and create summary from document
+    Results are cached locally by document text, so unchanged documents are not re-summarized
+    
+    Returns:
+        Dictionary with title, date, summary, or None if extraction fails
+    """
+    cached = lookupCachedSummary(document_text, filename, document_id)
+    if cached:
+        print(f"  ✓ Using cached summary ({cached['summary_length']} chars)")
+        return cached
+    
+    prompt = buildSummaryPrompt(document_text)
+    
     try:
         print(f"  Extracting metadata and summarizing...", end=' ')
         
         response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt
+            model=SUMMARY_MODEL,
+            contents=prompt,
+            config=SUMMARY_CONFIG
         )
         
-        response_text = response.text.strip()
+        result = parseSummaryResponse(response, document_text, filename, document_id)
+        if result:
+            rememberSummary(document_text, result)
         
-        # Remove markdown code blocks if present
-        if response_text.startswith('```'):
-            response_text = response_text.split('```')[1]
-            if response_text.startswith('json'):
-                response_text = response_text[4:]
-            response_text = response_text.strip()
+        return result
         
-        # Parse JSON response
-        data = json.loads(response_text)
+    except Exception as e:
+        print(f"✗ Error: {str(e)}")
+        return None
+
+async def extractMetadataAndSummarizeAsync(document_text, filename="", document_id=""):
+    """
+    Async version of extractMetadataAndSummarize (uses the client's aio interface)
+    Several calls can be awaited concurrently; the caller is responsible for rate limiting
+    and for checking lookupCachedSummary first (so cache hits skip the rate limiter)
+    
+    Returns:
+        Dictionary with title, date, summary, or None if extraction fails
+    """
+    prompt = buildSummaryPrompt(document_text)
+    prefix = f"  DocumentId={document_id}: "
+    
+    try:
+        response = await client.aio.models.generate_content(
+            model=SUMMARY_MODEL,
+            contents=prompt,
+            config=SUMMARY_CONFIG
+        )
         
-        # Validate required fields
-        if not data.get('meeting_title') or not data.get('meeting_date'):
-            print(f"✗ Missing title or date")
-            return None
+        result = parseSummaryResponse(response, document_text, filename, document_id, prefix)
+        if result:
+            await asyncio.to_thread(rememberSummary, document_text, result)
         
-        # Validate date format
-        if data['meeting_date'] == 'null' or not data['meeting_date']:
-            print(f"✗ Invalid date")
-            return None
+        return result
         
-        print(f"✓ ({len(data['summary'])} chars)")
-        
-        return {
-            'document_id': document_id,
-            'filename': filename,
-            'meeting_title': data['meeting_title'],
-            'meeting_date': data['meeting_date'],
-            'summary': data['summary'],
-            'original_length': len(document_text),
-            'summary_length': len(data['summary']),
-            'compression_ratio': round(len(document_text) / len(data['summary']), 1) if len(data['summary']) > 0 else 0
-        }
-        
-    except json.JSONDecodeError as e:
-        print(f"✗ JSON Error: {str(e)}")
-        print(f"Response was: {response_text[:200]}")
-        return None
     except Exception as e:
-        print(f"✗ Error: {str(e)}")
+        print(f"{prefix}✗ Error: {str(e)}")
         return None
 
-def summarizeMultipleDocuments(documents, delay=2.0):
+def createRateLimiter(requests_per_minute=REQUESTS_PER_MINUTE):
+    """
+    Rate limiter for Gemini calls: starts are spaced at least 60/requests_per_minute seconds apart
+    A call only waits if the previous one started less than that interval ago
+    
+    Args:
+        requests_per_minute: API rate limit to stay under
+    
+    Returns:
+        Async function to await right before each API call (use it from a single event loop)
+    """
+    min_interval = 60 / requests_per_minute
+    next_call_at = None
+    
+    async def waitForRateLimit():
+        nonlocal next_call_at
+        
+        now = asyncio.get_running_loop().time()
+        wait = (next_call_at or now) - now
+        next_call_at = max(now, next_call_at or now) + min_interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    return waitForRateLimit
+
+async def summarizeMultipleDocumentsAsync(documents, requests_per_minute=REQUESTS_PER_MINUTE, max_concurrency=MAX_CONCURRENT_REQUESTS):
+    """
+    Summarize documents with concurrent Gemini calls
+    
+    Args:
+        documents: List of documents from parser
+        requests_per_minute: API rate limit to stay under
+        max_concurrency: Maximum number of API calls in flight
+    
+    Returns:
+        List of results (summary dictionary or None), in documents order
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    waitForRateLimit = createRateLimiter(requests_per_minute)
+    
+    async def summarizeOne(doc):
+        # Cache hits need no API call, so they skip the rate limiter (SQLite lookup off the event loop)
+        cached = await asyncio.to_thread(lookupCachedSummary, doc['text'], doc['filename'], doc['document_id'])
+        if cached:
+            return cached
+        
+        async with semaphore:
+            await waitForRateLimit()
+            
+            return await extractMetadataAndSummarizeAsync(
+                document_text=doc['text'],
+                filename=doc['filename'],
+                document_id=doc['document_id']
+            )
+    
+    return await asyncio.gather(*[summarizeOne(doc) for doc in documents])
+
+def summarizeMultipleDocuments(documents, requests_per_minute=REQUESTS_PER_MINUTE, max_concurrency=MAX_CONCURRENT_REQUESTS):
     """
     Process multiple documents with metadata extraction
+    API calls run concurrently (see summarizeMultipleDocumentsAsync)
     
     Args:
         documents: List of documents from parser
-        delay: Delay between API calls (seconds)
+        requests_per_minute: API rate limit to stay under
+        max_concurrency: Maximum number of API calls in flight
     
     Returns:
         Tuple of (summaries, failed)
@@ -119,15 +317,11 @@ def summarizeMultipleDocuments(documents, delay=2.0):
     print(f"Processing {len(documents)} documents with Gemini...")
     print(f"{'='*70}\n")
     
-    for idx, doc in enumerate(documents, 1):
+    results = asyncio.run(summarizeMultipleDocumentsAsync(documents, requests_per_minute, max_concurrency))
+    
+    for idx, (doc, result) in enumerate(zip(documents, results), 1):
         print(f"[{idx}/{len(documents)}] {doc['filename']}")
         
-        result = extractMetadataAndSummarize(
-            document_text=doc['text'],
-            filename=doc['filename'],
-            document_id=doc['document_id']
-        )
-        
         if result:
             summaries.append(result)
             print(f"  ✓ Title: {result['meeting_title'][:50]}")
@@ -139,10 +333,6 @@ def summarizeMultipleDocuments(documents, delay=2.0):
                 'error': 'Failed to extract title or date'
             })
             print(f"  ✗ Skipping document (no valid title/date)\n")
-        
-        # Rate limiting
-        if idx < len(documents):
-            time.sleep(delay)
     
     print(f"{'='*70}")
     print(f"Processing Complete:")
@@ -158,7 +348,7 @@ def testGeminiConnection():
     
     try:
         response = client.models.generate_content(
-            model='gemini-2.0-flash-exp',
+            model=SUMMARY_MODEL,
             contents="Say 'Hello from Gemini!' if you're working."
         )
         
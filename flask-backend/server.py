@@ -1,9 +1,59 @@
+from functools import wraps
 from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from flask_caching import Cache
+import orjson
 from database import getAllSummaries, getSummaryByDocumentId, getRecentSummaries
 
+# How long GET responses are served from cache (summaries only change when the scraper runs)
+RESPONSE_CACHE_TIMEOUT = 300
+
+# How long browsers may reuse a single-summary response before revalidating it with If-None-Match
+CLIENT_CACHE_MAX_AGE = 60
+
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify/request.json backed by orjson (C serializer) instead of the stdlib json module"""
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': RESPONSE_CACHE_TIMEOUT})
+
+def only_cache_success(response):
+    """Error views return (response, status) tuples; only plain successful responses are cached"""
+    return not isinstance(response, tuple)
+
+def conditional_response(view):
+    """
+    Tag successful responses with an ETag (hash of the body) and answer a matching
+    If-None-Match with an empty 304, so clients that already have the summary skip the body
+    Applied outside @cache.cached: a cached body is revalidated without touching the database
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = app.make_response(view(*args, **kwargs))
+        
+        if response.status_code == 200:
+            response.add_etag()
+            response.cache_control.private = True
+            response.cache_control.max_age = CLIENT_CACHE_MAX_AGE
+            response.make_conditional(request)
+        
+        return response
+    return wrapper
 
 @app.route('/')
 def home():
@@ -18,16 +68,30 @@ def home():
     })
 
 @app.route('/summaries', methods=['GET'])
+@cache.cached(query_string=True, response_filter=only_cache_success)
 def get_summaries():
     try:
         limit = request.args.get('limit', default=30, type=int)
-        summaries = getAllSummaries(limit=limit)
+        
+        # Next page: pass meeting_date and document_id of the last row received
+        before_date = request.args.get('before_date')
+        before_id = request.args.get('before_id')
+        if bool(before_date) != bool(before_id):
+            raise ValueError("before_date and before_id must be given together")
+        before = (before_date, before_id) if before_date else None
+        
+        summaries = getAllSummaries(limit=limit, before=before)
         
         return jsonify({
             "success": True,
             "count": len(summaries),
             "data": summaries
         })
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             "success": False,
@@ -35,6 +99,8 @@ def get_summaries():
         }), 500
 
 @app.route('/summaries/<document_id>', methods=['GET'])
+@conditional_response
+@cache.cached(response_filter=only_cache_success)
 def get_summary(document_id):
     try:
         summary = getSummaryByDocumentId(document_id)
@@ -57,6 +123,7 @@ def get_summary(document_id):
         }), 500
 
 @app.route('/summaries/recent', methods=['GET'])
+@cache.cached(query_string=True, response_filter=only_cache_success)
 def get_recent_summaries():
     try:
         days = request.args.get('days', default=30, type=int)
@@ -82,4 +149,5 @@ def health_check():
     })
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Development server only (set FLASK_DEBUG=1 for the reloader); production uses gunicorn_conf.py
+    app.run(port=5000)
\ No newline at end of file